@@ -1,9 +1,10 @@
 import sys
 import os
+import io
 import re
-import mailbox
 import email
 import email.header
+import email.utils
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 from datetime import datetime
@@ -11,8 +12,31 @@ import threading
 import queue
 import time
 import logging
+import mmap
 import traceback
-import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import math
+import hashlib
+import functools
+import copy
+from array import array
+from bisect import bisect_left
+
+try:
+    # Optional Rust MIME parser, much faster than the email package for bulk body extraction
+    import fast_mail_parser
+except ImportError:
+    fast_mail_parser = None
+
+try:
+    # Used for copy-on-write clones of backups, not available on Windows
+    import fcntl
+except ImportError:
+    fcntl = None
+from itertools import compress, count, repeat, takewhile
+from operator import contains, eq, le, not_
 
 # Configure logging to both file and console
 logging.basicConfig(
@@ -31,17 +55,683 @@ console_handler.setFormatter(console_formatter)
 logger.addHandler(console_handler)
 
 
-class QueueHandler(logging.Handler):
+class NotifyingQueue(queue.Queue):
     """
-    A handler that puts log records into a queue for the main thread to process
+    A queue that calls notify() after every put, so the consumer can be woken
+    up instead of polling for new items
     """
 
-    def __init__(self, log_queue):
+    def __init__(self, notify):
         super().__init__()
-        self.log_queue = log_queue
+        self.notify = notify
 
-    def emit(self, record):
-        self.log_queue.put(record)
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        self.notify()
+
+
+class GatherWriter:
+    """
+    Collects buffers for an unbuffered file and writes them with one os.writev() call per batch,
+    so they go to the kernel straight from where they are instead of through a write buffer.
+    Full batches are written by a background thread while the next one is collected.
+    """
+
+    def __init__(self, f, batch_size):
+        self.fd = f.fileno()
+        self.batch_size = batch_size  # Bytes collected before writing
+        try:
+            self.max_buffers = min(os.sysconf('SC_IOV_MAX'), 1024)
+        except (AttributeError, ValueError, OSError):
+            self.max_buffers = 16  # The POSIX minimum
+        self.buffers = []
+        self.size = 0
+        self.pending = queue.Queue(maxsize=1)  # One batch waits while the other is written
+        self.thread = None
+        self.error = None
+
+    def write(self, data):
+        """Queue a buffer, it must stay unchanged until the next flush()"""
+        self.buffers.append(data)
+        self.size += len(data)
+        if self.size >= self.batch_size or len(self.buffers) >= self.max_buffers:
+            self._submit()
+
+    def _submit(self):
+        """Hand the collected buffers to the writer thread and start a new batch"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._write_batches, daemon=True)
+            self.thread.start()
+        self._raise_error()
+        self.pending.put(self.buffers)
+        self.buffers = []
+        self.size = 0
+
+    def _write_batches(self):
+        """Writer thread, writes batches until close() sends None"""
+        while (buffers := self.pending.get()) is not None:
+            try:
+                if self.error is None:
+                    self._writev(buffers)
+            except Exception as e:
+                self.error = e  # Raised in the collecting thread, later batches are dropped
+            finally:
+                self.pending.task_done()
+        self.pending.task_done()
+
+    def _writev(self, buffers):
+        """Write buffers completely"""
+        start = 0
+        while start < len(buffers):
+            written = os.writev(self.fd, buffers[start:])
+            # Skip what was written, a partial write leaves the rest of one buffer
+            while start < len(buffers) and written >= len(buffers[start]):
+                written -= len(buffers[start])
+                start += 1
+            if written:
+                buffers[start] = memoryview(buffers[start])[written:]
+
+    def _raise_error(self):
+        """Raise the error the writer thread hit, if any"""
+        if self.error is not None:
+            raise self.error
+
+    def flush(self):
+        """Write all queued buffers and wait until they are written"""
+        if self.thread is None:
+            # Nothing is being written in the background, so there is nothing to overlap with
+            self._writev(self.buffers)
+            self.buffers = []
+            self.size = 0
+            return
+        if self.buffers:
+            self._submit()
+        self.pending.join()
+        self._raise_error()
+
+    def close(self):
+        """Stop the writer thread without writing what is still collected"""
+        if self.thread is not None:
+            self.pending.put(None)
+            self.thread.join()
+            self.thread = None
+        self.buffers = []
+        self.size = 0
+
+
+def open_for_writing(path):
+    """Open an output mbox file, unbuffered where os.writev() gathers the writes instead"""
+    if hasattr(os, 'writev'):
+        return open(path, 'wb', buffering=0)
+    return open(path, 'wb', buffering=io_buffer_size(path))
+
+
+class FastMbox:
+    """
+    Streaming mbox reader that maps the file and splits it on "From " lines
+    without building an index of the whole file first
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pos = 0  # File offset just past the last message yielded
+        self._map = None  # Read-only map of the file, shared by the iterator and get_bytes()
+        self._map_lock = threading.Lock()
+        self.closed = False  # Once closed the file may be replaced, so it is never mapped again
+
+    def __iter__(self):
+        """
+        Yield (offset, from_line, msg) for each message in file order. msg is a
+        memoryview into the file map rather than a copy, only valid while the map is open.
+        """
+        self.pos = 0
+        data = self._get_map()
+        if data is None:
+            return
+        with memoryview(data) as view:
+            # The scan reads the map once front to back, so let the kernel read further
+            # ahead and free pages behind it. Later reads by offset are random again
+            self._advise(data, 'MADV_SEQUENTIAL')
+            try:
+                yield from self._scan(data, view)
+            finally:
+                self._advise(data, 'MADV_NORMAL')
+
+    @staticmethod
+    def _advise(data, name):
+        """Give the kernel an access pattern hint for the map where the platform supports it"""
+        advice = getattr(mmap, name, None)
+        if advice is None or not hasattr(data, 'madvise'):
+            return
+        try:
+            data.madvise(advice)
+        except (OSError, ValueError):
+            # Only a hint, and the map may already be closed when a cancelled scan is cleaned up
+            pass
+
+    def _scan(self, data, view):
+        """Find the message boundaries in the mapped file"""
+        size = len(data)
+
+        # Skip anything before the first From_ line
+        if data[:5] == b'From ':
+            start = 0
+        else:
+            start = data.find(b'\nFrom ')
+            if start < 0:
+                return
+            start += 1
+
+        while start < size:
+            # The boundary search runs in C over the mapped file, no per-line Python work
+            end = data.find(b'\nFrom ', start)
+            if end < 0:
+                end = size
+                # The blank separator line before EOF is not part of the message
+                if data[end - 2:end] == b'\n\n':
+                    end -= 1
+                self.pos = size
+            else:
+                self.pos = end + 1
+                # Like mailbox.mbox, only a blank separator line is left out of the message
+                if data[end - 1:end] != b'\n':
+                    end += 1
+
+            line_end = data.find(b'\n', start, end)
+            if line_end < 0:
+                # A From_ line at EOF without a newline. The empty message is placed one
+                # byte past it, as if the newline were there, for get_from_line()
+                yield end + 1, data[start:end].rstrip(b'\r'), b''
+            else:
+                yield line_end + 1, data[start:line_end].rstrip(b'\r'), view[line_end + 1:end]
+            start = self.pos
+
+    def _get_map(self):
+        """Map the file on first use, returns None for an empty file"""
+        if self._map is None:
+            with self._map_lock:
+                if self.closed:
+                    raise ValueError(f"mbox file {self.path} is closed")
+                if self._map is None:
+                    # The map keeps its own handle, so a raw descriptor is enough here
+                    fd = os.open(self.path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+                    try:
+                        if os.fstat(fd).st_size == 0:
+                            return None
+                        self._map = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+                    finally:
+                        os.close(fd)
+        return self._map
+
+    def get_bytes(self, offset, length):
+        """Return the message bytes at a file offset yielded by the iterator"""
+        return self._get_map()[offset:offset + length]
+
+    def get_from_line(self, offset):
+        """Return the From_ line just before the message at a file offset yielded by the iterator"""
+        data = self._get_map()
+        start = data.rfind(b'\n', 0, offset - 1) + 1
+        return data[start:offset - 1].rstrip(b'\r')
+
+    def get_entry_span(self, offset, length):
+        """
+        Return the (start, stop) file span holding the From_ line, message and blank separator line
+        of a message exactly as EntryWriter frames them, or None when the file frames it differently.
+        """
+        data = self._get_map()
+        end = offset + length
+        # The message has to end with a newline followed by the blank separator line, and the
+        # From_ line must not end with '\r\n' since that '\r' is dropped
+        if length == 0 or data[end - 1:end + 1] != b'\n\n' or data[offset - 2:offset] == b'\r\n':
+            return None
+        return data.rfind(b'\n', 0, offset - 1) + 1, end + 1
+
+    def entry_writer(self, f):
+        """Return an EntryWriter copying messages of this file to a binary file"""
+        return EntryWriter(self, f)
+
+    def close(self):
+        """Release the file map, later reads raise ValueError instead of mapping the file again"""
+        with self._map_lock:
+            self.closed = True
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A message view is still alive, the map is closed once it is released
+                pass
+            self._map = None
+
+
+class EntryWriter:
+    """
+    Writes (offset, length) messages of a FastMbox to a binary file, framed the way mailbox.mbox does.
+    An unbuffered file gets gathered writes straight from the map. A buffered one copies
+    everything through its buffer first, which rewriting the mapped file in place relies on.
+    Used as a context manager around a whole export, so runs of adjacent entries and the
+    background writes carry on from one batch of messages to the next.
+    """
+
+    def __init__(self, mbox, f):
+        self.mbox = mbox
+        self.f = f
+        self.data = None
+        self.view = None
+        self.out = f  # Where the framed messages go, a GatherWriter for unbuffered files
+        self.run_start = self.run_stop = 0  # Span of the map waiting to be written as one piece
+
+    def __enter__(self):
+        self.data = self.mbox._get_map()
+        if self.data is not None:
+            # Rows are written in file order, so read ahead of them like the loading scan does
+            self.mbox._advise(self.data, 'MADV_SEQUENTIAL')
+            self.view = memoryview(self.data)
+        if isinstance(self.f, io.RawIOBase) and hasattr(os, 'writev'):
+            self.out = GatherWriter(self.f, MBOX_IO_BUFFER_SIZE)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        try:
+            if exc_type is None:
+                self._write_span(self.run_start, self.run_stop)
+                if self.out is not self.f:
+                    self.out.flush()
+        finally:
+            if self.out is not self.f:
+                self.out.close()  # Before the map views it holds are released
+                self.out = self.f
+            if self.view is not None:
+                self.view.release()
+                self.mbox._advise(self.data, 'MADV_NORMAL')
+            self.data = self.view = None
+
+    def write(self, spans):
+        """Write the framed messages, copying adjacent entries as one run"""
+        # Messages were split at every '\nFrom ', so no line in them needs '>From ' quoting
+        out = self.out
+        for offset, length in spans:
+            span = self.mbox.get_entry_span(offset, length)
+            if span is not None and span[0] == self.run_stop:
+                self.run_stop = span[1]
+                continue
+            self._write_span(self.run_start, self.run_stop)
+            if span is not None:
+                # Usually the entry is already framed in the file and is copied straight from the map
+                self.run_start, self.run_stop = span
+            else:
+                self.run_start = self.run_stop = 0
+                # Read before the message is written, rewriting in place may overwrite it
+                from_line = self.mbox.get_from_line(offset)
+                ends_with_newline = length and self.data[offset + length - 1] == 10
+                out.write(from_line)
+                out.write(b'\n')
+                self._write_span(offset, offset + length)
+                # The message ends with a newline, then a blank separator line follows
+                out.write(b'\n' if ends_with_newline else b'\n\n')
+
+    def _write_span(self, start, stop):
+        """Write a span of the map in pieces no larger than the export write buffer"""
+        # Pieces that fit the buffer are copied into it before any earlier data is flushed, so
+        # rewriting the mapped file in place never overwrites bytes that are still to be copied
+        for piece_start in range(start, stop, MBOX_IO_BUFFER_SIZE):
+            self.out.write(self.view[piece_start:min(piece_start + MBOX_IO_BUFFER_SIZE, stop)])
+
+
+# Headers needed for the email list, mapped to the keys used in the email data
+HEADER_FIELDS = {
+    b'from': 'from',
+    b'to': 'to',
+    b'subject': 'subject',
+    b'date': 'date',
+    b'message-id': 'message_id',
+}
+HEADER_SCAN_SIZE = 8 * 1024  # Header blocks are nearly always shorter than this
+
+# Codecs for the charsets most encoded headers use, decoded in one step without the fallback
+# chain. US-ASCII goes through UTF-8, a superset, since mislabelled UTF-8 is common
+HEADER_CHARSETS = {
+    'utf-8': 'utf-8',
+    'utf8': 'utf-8',
+    'us-ascii': 'utf-8',
+    'ascii': 'utf-8',
+    'iso-8859-1': 'latin-1',
+    'latin1': 'latin-1',
+    'iso-8859-15': 'iso8859-15',
+    'windows-1252': 'cp1252',
+    'windows-1251': 'cp1251',
+    'koi8-r': 'koi8-r',
+    'gb2312': 'gb2312',
+    'gbk': 'gbk',
+    'big5': 'big5',
+    'shift_jis': 'shift_jis',
+    'iso-2022-jp': 'iso2022_jp',
+    'euc-kr': 'euc_kr',
+}
+
+# Compiled once, used for every HTML-only email while extracting bodies. The bytes variant
+# strips tags before decoding, so the markup is never decoded
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+HTML_TAG_BYTES_RE = re.compile(rb'<[^>]+>')
+
+# Body tokens for the content search index. Any occurrence of a word made only of these
+# characters lies inside one token, so looking through the tokens finds every match
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+INDEX_MIN_WORD = 3  # Shorter words match most tokens, scanning the bodies is faster
+
+# Body extraction is CPU bound, large batches are spread over worker processes
+BODY_POOL_MIN_ROWS = 5000  # Below this, starting the workers costs more than it saves
+BODY_POOL_BATCH = 1000  # Messages per worker task
+
+# Header parsing of big files is spread over worker processes the same way
+PARSE_POOL_MIN_SIZE = 256 * 1024 * 1024  # Smaller files load in a few seconds without them
+PARSE_POOL_BATCH = 2000  # Messages per worker task
+
+# Export, modify and backup move data in blocks of this size, a few MiB per call keeps the
+# syscall count low on both SSDs and network file systems
+MBOX_IO_BUFFER_SIZE = 4 * 1024 * 1024
+EXPORT_PROGRESS_BATCH = 1024  # Emails written between progress checks
+
+FICLONE = 0x40049409  # Linux ioctl cloning a whole file on copy-on-write filesystems (btrfs, xfs)
+
+# Linux filesystems with a native fallocate(). On others glibc's posix_fallocate()
+# writes every block instead, doubling the I/O of the write it was meant to speed up
+FALLOCATE_FILESYSTEMS = {'ext4', 'xfs', 'btrfs', 'tmpfs', 'f2fs', 'ocfs2', 'bcachefs'}
+
+# Relative cost of computing each filter from scratch, cheapest first. The date filter is a
+# bisect, header filters scan short strings and the content filter may parse every body
+FILTER_COSTS = {'date': 0, 'subject': 1, 'from': 1, 'to': 1, 'content': 2}
+
+
+def header_block_end(data):
+    """Return where the blank line ending the header block starts, for LF or CRLF line endings, or -1"""
+    end = data.find(b'\n\n')
+    crlf_end = data.find(b'\r\n\r\n')
+    if end < 0 or 0 <= crlf_end < end:
+        end = crlf_end
+    return end
+
+
+def extract_headers_fast(msg_bytes):
+    """
+    Pull the list headers out of raw message bytes (or a memoryview of them) without
+    building a full email.message.Message. Values are unfolded but not RFC 2047 decoded.
+    """
+    # Only the header block is copied out of the message
+    head = bytes(msg_bytes[:HEADER_SCAN_SIZE])
+    end = header_block_end(head)
+    if end < 0:
+        # Unusually long header block, or a message without a body
+        head = bytes(msg_bytes)
+        end = header_block_end(head)
+    if end >= 0:
+        head = head[:end]
+
+    headers = {}
+    current = None
+    for line in head.split(b'\n'):
+        line = line.rstrip(b'\r')
+        if line[:1] in (b' ', b'\t'):
+            # Continuation of a folded header
+            if current is not None:
+                headers[current] += line
+            continue
+
+        name, sep, value = line.partition(b':')
+        field = HEADER_FIELDS.get(name.strip().lower()) if sep else None
+        if field is None or field in headers:
+            # Like Message.get, the first occurrence of a header wins
+            current = None
+            continue
+        headers[field] = value.lstrip()
+        current = field
+
+    return {field: value.strip().decode('utf-8', errors='replace') for field, value in headers.items()}
+
+
+def body_search_text(msg_bytes):
+    """Return the lowercased body text of raw message bytes that the content filter searches"""
+    if fast_mail_parser is not None:
+        try:
+            mail = fast_mail_parser.parse_email(bytes(msg_bytes))
+        except fast_mail_parser.ParseError:
+            pass  # Let the email package make what it can of it
+        else:
+            # Same preference as extract_email_body(), plain text parts first, else stripped HTML
+            if mail.text_plain:
+                return "".join(part + "\n" for part in mail.text_plain).lower()
+            if mail.text_html:
+                return HTML_TAG_RE.sub(' ', mail.text_html[0]).lower()
+    message = email.message_from_bytes(msg_bytes)
+    return MboxManagerApp.extract_email_body(message).lower()
+
+
+def io_buffer_size(path):
+    """Return MBOX_IO_BUFFER_SIZE rounded up to whole blocks of the file system path is on"""
+    try:
+        block_size = os.statvfs(os.path.dirname(os.path.abspath(path))).f_bsize
+    except (AttributeError, OSError):
+        return MBOX_IO_BUFFER_SIZE  # No statvfs() on Windows
+    if block_size <= 0:
+        return MBOX_IO_BUFFER_SIZE
+    return -(-MBOX_IO_BUFFER_SIZE // block_size) * block_size
+
+
+def fadvise(fd, name):
+    """Give the kernel an access pattern hint for a whole file where the platform supports it"""
+    advice = getattr(os, name, None)
+    if advice is None or not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        pass  # Only a hint
+
+
+def filesystem_type(path):
+    """Return the type of the Linux filesystem holding path, from the mount table, or None"""
+    path = os.path.realpath(path)
+    fs_type = None
+    best = -1
+    try:
+        with open('/proc/self/mounts') as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # Spaces and other special characters in mount points are octal escaped
+                mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+                inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+                if inside and len(mount_point) >= best:
+                    fs_type = fields[2]
+                    best = len(mount_point)
+    except OSError:
+        return None
+    return fs_type
+
+
+def preallocate(f, size):
+    """Reserve size bytes for a new file up front where the filesystem can, so it is laid out contiguously"""
+    if size <= 0 or not hasattr(os, 'posix_fallocate'):
+        return
+    if sys.platform.startswith('linux') and filesystem_type(os.path.dirname(os.path.abspath(f.name))) \
+            not in FALLOCATE_FILESYSTEMS:
+        return  # Emulated by writing zeros, or not known to be native
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError:
+        pass  # The writes allocate as they go instead
+
+
+class EmailStore:
+    """
+    Column-wise storage for loaded emails, one list per field indexed by row id,
+    so filters scan a single list instead of looking fields up in a dict per email.
+    Message bytes stay in the mbox file and are read back by offset and length.
+    """
+
+    FIELDS = ('offset', 'length', 'from', 'to', 'subject', 'date_epoch', 'formatted_date', 'message_id', 'body')
+    # Numeric fields are kept in compact typed arrays instead of lists of Python objects
+    TYPECODES = {'offset': 'q', 'length': 'q', 'date_epoch': 'd'}
+
+    def __init__(self, source=None):
+        self.source = source  # FastMbox the offsets point into
+        self.cols = {field: self.new_column(field) for field in self.FIELDS}
+        # Inverted index of body tokens as {token: sorted row ids}, built by the filter thread
+        self.token_index = {}
+        self.indexed_rows = 0
+        # Lowercased copies of the header columns the filters search, built by the filter thread
+        self.lowered_cols = {}
+        # Dated row ids sorted by date_epoch with their dates, and the rows without a date,
+        # built by the filter thread
+        self.date_order = array('I')
+        self.sorted_dates = array('d')
+        self.undated_rows = array('I')
+        self.date_indexed_rows = 0
+
+    def new_column(self, field, values=()):
+        """Create an empty column, or one holding values, with the right container for the field"""
+        typecode = self.TYPECODES.get(field)
+        if typecode:
+            return array(typecode, values)
+        return list(values)
+
+    def __len__(self):
+        # The last field is appended last, so every column has at least this many rows
+        # even while the loader thread is appending
+        return len(self.cols[self.FIELDS[-1]])
+
+    def append(self, email_data):
+        """Append an email data dict as a new row"""
+        # Columns are filled in FIELDS order, so the length column is updated last
+        for field, col in self.cols.items():
+            col.append(email_data[field])
+
+    def get_raw(self, row):
+        """Read the raw message bytes of a row from the mbox file"""
+        return self.source.get_bytes(self.cols['offset'][row], self.cols['length'][row])
+
+    def get_from_line(self, row):
+        """Read the From_ line of a row from the mbox file"""
+        return self.source.get_from_line(self.cols['offset'][row])
+
+    def entry_writer(self, f):
+        """Return an EntryWriter for write_entries(), to be used around the whole write"""
+        return self.source.entry_writer(f)
+
+    def write_entries(self, writer, rows):
+        """Write rows as mbox entries through an EntryWriter, keeping their original From_ lines"""
+        offsets = self.cols['offset']
+        lengths = self.cols['length']
+        writer.write((offsets[row], lengths[row]) for row in rows)
+
+    def file_order(self, rows):
+        """Return rows sorted by their position in the mbox file, so writing them reads it front to back"""
+        offsets = self.cols['offset']
+        positions = array('q', map(offsets.__getitem__, rows))
+        if all(map(le, positions, positions[1:])):
+            return rows  # Rows normally follow the file already
+        return array('I', sorted(rows, key=offsets.__getitem__))
+
+    def framed_layout(self, rows):
+        """Return the message offsets and lengths rows get when written out in order, and the file size"""
+        offsets = array('q')
+        lengths = array('q')
+        written = 0
+        for row in rows:
+            offset = self.cols['offset'][row]
+            length = self.cols['length'][row]
+            written += len(self.get_from_line(row)) + 1
+            offsets.append(written)
+            # A message not ending with a newline gets one, ahead of the blank separator line
+            if not (length and self.source.get_bytes(offset + length - 1, 1) == b'\n'):
+                length += 1
+            lengths.append(length)
+            written += length + 1
+        return offsets, lengths, written
+
+    def can_rewrite_in_place(self, rows, new_offsets):
+        """Whether writing rows over their own file from the start never reaches a row before it is read"""
+        offsets = self.cols['offset']
+        for row, new_offset in zip(rows, new_offsets):
+            offset = offsets[row]
+            # A From_ line ending in '\r\n' loses its '\r' when written, so the row starts a byte earlier
+            if self.source.get_bytes(offset - 2, 1) == b'\r':
+                offset -= 1
+            if new_offset > offset:
+                return False
+        return True
+
+    def lowered(self, field):
+        """Return the lowercased values of a text column, lowering only rows added since the last call"""
+        lowered = self.lowered_cols.setdefault(field, [])
+        col = self.cols[field]
+        if len(lowered) < len(col):
+            lowered.extend(map(str.lower, col[len(lowered):]))
+        return lowered
+
+    def update_token_index(self, bodies):
+        """Add the body tokens of rows that are not indexed yet"""
+        index = self.token_index
+        for row in range(self.indexed_rows, len(bodies)):
+            for token in set(TOKEN_RE.findall(bodies[row])):
+                postings = index.get(token)
+                if postings is None:
+                    postings = index[token] = array('I')
+                postings.append(row)
+        self.indexed_rows = max(self.indexed_rows, len(bodies))
+
+    @staticmethod
+    def can_use_index(word):
+        """Whether the token index can answer a search for word"""
+        return len(word) >= INDEX_MIN_WORD and TOKEN_RE.fullmatch(word) is not None
+
+    def rows_with_word(self, word):
+        """Return the indexed row ids whose body contains word"""
+        index = self.token_index
+        rows = set()
+        # Vocabulary is much smaller than the bodies, only tokens containing word are merged
+        for postings in compress(index.values(), map(contains, index.keys(), repeat(word))):
+            rows.update(postings)
+        return rows
+
+    def update_date_index(self):
+        """Sort the rows by date again if rows were added since the last sort"""
+        row_count = len(self)
+        if self.date_indexed_rows == row_count:
+            return
+        dates = self.cols['date_epoch']
+        undated = list(map(math.isnan, dates[:row_count]))
+        order = sorted(compress(range(row_count), map(not_, undated)), key=dates.__getitem__)
+        self.date_order = array('I', order)
+        self.sorted_dates = array('d', map(dates.__getitem__, order))
+        self.undated_rows = array('I', compress(range(row_count), undated))
+        self.date_indexed_rows = row_count
+
+    def rows_since(self, cutoff):
+        """Return the row ids dated at or after cutoff, plus the rows without a date"""
+        self.update_date_index()
+        rows = set(self.date_order[bisect_left(self.sorted_dates, cutoff):])
+        rows.update(self.undated_rows)
+        return rows
+
+    def take(self, rows):
+        """Return a new store holding only the given row ids, in that order"""
+        if len(rows) == len(self) and all(map(eq, rows, count())):
+            # Every row is kept in place, so the new store shares the columns and the indexes
+            # built over them. Only its column dict is its own, for callers that replace columns
+            store = copy.copy(self)
+            store.cols = dict(self.cols)
+            return store
+
+        store = EmailStore(self.source)
+        for field, col in self.cols.items():
+            store.cols[field] = store.new_column(field, (col[row] for row in rows))
+        # Kept rows keep their lowercased values up to the first row that was never lowered,
+        # the rest are lowered on next use
+        for field, lowered in self.lowered_cols.items():
+            lowered_count = len(lowered)
+            store.lowered_cols[field] = [lowered[row] for row in takewhile(lambda row: row < lowered_count, rows)]
+        return store
 
 
 class MboxManagerApp:
@@ -52,9 +742,10 @@ class MboxManagerApp:
 
         # Store loaded mbox data
         self.mbox = None
-        self.emails = []
-        self.filtered_emails = []
+        self.emails = EmailStore()
+        self.filtered_emails = array('I')  # Row ids into self.emails that pass the filters, 4 bytes each
         self.emails_per_page = 100
+        self.filter_delay_ms = 200  # Typing pause before filters are applied
         self.current_page = 0
         self.total_pages = 0
         self.loading_cancelled = False
@@ -65,21 +756,43 @@ class MboxManagerApp:
         # Track selected emails across all pages
         self.selected_email_indices = set()
 
-        # Create a queue for thread communication
-        self.queue = queue.Queue()
+        # Producers wake the Tk thread with a one-shot after_idle() when they post to a
+        # queue. A Tcl built without thread support can't take calls from other threads,
+        # so fall back to polling there
+        self._event_driven = self.tcl_is_threaded()
+        self._pending_checks = set()
+        self._pending_lock = threading.Lock()
 
-        # Create log handler for UI
-        self.log_queue = queue.Queue()
-        self.log_handler = QueueHandler(self.log_queue)
-        self.log_handler.setLevel(logging.INFO)
-        logger.addHandler(self.log_handler)
+        # Create a queue for thread communication
+        self.queue = NotifyingQueue(lambda: self.wake(self.check_queue))
 
         # Create dictionary to map tree items to email indices
         self.tree_item_to_email = {}
 
-        # Track in-memory email IDs to prevent duplicates
+        # Treeview items reused from page to page instead of being deleted and re-inserted
+        self._tree_items = []
+
+        # Track hashes of in-memory email IDs to prevent duplicates. A 64-bit hash is
+        # much smaller than the ID string and collisions are negligible at mailbox sizes
         self.email_id_tracker = set()
 
+        # Pending after() job for the debounced filter, and the last filter request sent
+        self._filter_job = None
+        self._filter_request = None
+
+        # Last result of each filter field as {field: (filter spec, store, row count, matching row ids)}
+        self._filter_cache = {}
+
+        # Filtering runs on its own thread; results older than the latest generation are discarded
+        self._filter_gen = 0
+        self._filter_queue = queue.Queue()
+        self._filter_thread = threading.Thread(target=self.filter_worker)
+        self._filter_thread.daemon = True
+        self._filter_thread.start()
+
+        # Set while the original file is being rewritten, the loaded emails can't be read meanwhile
+        self.rewriting = False
+
         # Filter mode variables
         self.subject_filter_mode = tk.StringVar(value="contains")
         self.from_filter_mode = tk.StringVar(value="contains")
@@ -90,9 +803,8 @@ class MboxManagerApp:
         self.create_widgets()
         self.setup_layout()
 
-        # Start the periodic check for queue updates
+        # Drain anything queued during setup (and start polling if not event driven)
         self.check_queue()
-        self.check_log_queue()
 
     def create_widgets(self):
         # Top frame for file operations
@@ -122,7 +834,7 @@ class MboxManagerApp:
         # Subject filter
         self.subject_filter_label = ttk.Label(self.filter_frame, text="Subject:")
         self.subject_filter = ttk.Entry(self.filter_frame, width=30)
-        self.subject_filter.bind("<KeyRelease>", self.apply_filters)
+        self.subject_filter.bind("<KeyRelease>", self.schedule_filters)
 
         # Subject filter mode
         self.subject_filter_mode_combobox = ttk.Combobox(self.filter_frame,
@@ -135,7 +847,7 @@ class MboxManagerApp:
         # From filter
         self.from_filter_label = ttk.Label(self.filter_frame, text="From:")
         self.from_filter = ttk.Entry(self.filter_frame, width=30)
-        self.from_filter.bind("<KeyRelease>", self.apply_filters)
+        self.from_filter.bind("<KeyRelease>", self.schedule_filters)
 
         # From filter mode
         self.from_filter_mode_combobox = ttk.Combobox(self.filter_frame,
@@ -148,7 +860,7 @@ class MboxManagerApp:
         # To filter
         self.to_filter_label = ttk.Label(self.filter_frame, text="To:")
         self.to_filter = ttk.Entry(self.filter_frame, width=30)
-        self.to_filter.bind("<KeyRelease>", self.apply_filters)
+        self.to_filter.bind("<KeyRelease>", self.schedule_filters)
 
         # To filter mode
         self.to_filter_mode_combobox = ttk.Combobox(self.filter_frame,
@@ -161,12 +873,12 @@ class MboxManagerApp:
         # Date filter
         self.date_filter_label = ttk.Label(self.filter_frame, text="Date after (YYYY-MM-DD):")
         self.date_filter = ttk.Entry(self.filter_frame, width=15)
-        self.date_filter.bind("<KeyRelease>", self.apply_filters)
+        self.date_filter.bind("<KeyRelease>", self.schedule_filters)
 
         # Message content filter
         self.content_filter_label = ttk.Label(self.filter_frame, text="Message content (comma-separated):")
         self.content_filter = ttk.Entry(self.filter_frame, width=30)
-        self.content_filter.bind("<KeyRelease>", self.apply_filters)
+        self.content_filter.bind("<KeyRelease>", self.schedule_filters)
 
         # Content filter mode
         self.content_filter_mode_combobox = ttk.Combobox(self.filter_frame,
@@ -442,11 +1154,17 @@ class MboxManagerApp:
             # Reset flags and data
             self.loading_cancelled = False
             self.emails_loaded = 0
-            self.emails = []
-            self.filtered_emails = []
+            self.emails = EmailStore()
+            self.filtered_emails = array('I')
             self.email_id_tracker.clear()
+            self._filter_cache.clear()
+            self.render_email_body.cache_clear()
             self.selected_email_indices.clear()
 
+            # Removing and exporting wait for the whole file, the loader keeps appending to the store
+            self.remove_button.config(state=tk.DISABLED)
+            self.export_button.config(state=tk.DISABLED)
+
             # Enable cancel button
             self.cancel_button.config(state=tk.NORMAL)
 
@@ -474,7 +1192,7 @@ class MboxManagerApp:
         """
         try:
             # First, try to estimate total emails using file size for very large files
-            start_time = time.time()
+            start_time = time.monotonic()
             self.queue.put(('status', "Analyzing file..."))
 
             # Get file size in MB for estimation
@@ -487,185 +1205,159 @@ class MboxManagerApp:
             logger.info(f"Sampling rate: 1:{sampling_rate}")
             logger.info(f"Started processing at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-            # For huge files, estimate based on file size instead of counting
-            if file_size_mb > 1000:  # > 1GB
-                # Very rough estimation: ~100KB per email on average
-                # This varies greatly but gives us a starting point
-                estimated_emails = int(file_size_mb * 10)  # 10 emails per MB is a rough estimate
-                self.total_emails = estimated_emails
-                logger.info(f"Estimated total emails based on file size: ~{estimated_emails:,}")
-                self.queue.put(('status', f"Estimated ~{estimated_emails:,} emails, loading..."))
-            else:
-                try:
-                    # Try to count emails for smaller files
-                    self.queue.put(('status', "Counting emails..."))
-                    self.mbox = mailbox.mbox(file_path)
-                    self.total_emails = len(self.mbox)
-                    logger.info(f"Total emails in mailbox: {self.total_emails:,}")
-                    self.queue.put(('status', f"Found {self.total_emails:,} emails, loading..."))
-                except Exception as e:
-                    logger.warning(f"Error counting emails: {str(e)}")
-                    # Fallback to estimation
-                    estimated_emails = int(file_size_mb * 10)
-                    self.total_emails = estimated_emails
-                    self.queue.put(('status', f"Unable to count, estimated ~{estimated_emails:,} emails, loading..."))
+            # Estimate based on file size instead of counting, counting would mean
+            # scanning the whole file once before loading anything.
+            # Very rough estimation: ~100KB per email on average, refined from the
+            # file position as loading progresses
+            estimated_emails = int(file_size_mb * 10)  # 10 emails per MB is a rough estimate
+            self.total_emails = estimated_emails
+            logger.info(f"Estimated total emails based on file size: ~{estimated_emails:,}")
+            self.queue.put(('status', f"Estimated ~{estimated_emails:,} emails, loading..."))
 
-            # Open the mbox file
-            self.mbox = mailbox.mbox(file_path)
+            # Open the mbox file for streaming
+            self.mbox = FastMbox(file_path)
 
             # Initialize counts and storage
-            self.emails = []
+            self.emails = EmailStore(self.mbox)
             self.emails_loaded = 0
-            chunk_size = 1000  # Process in chunks for better responsiveness
-            current_chunk = []
             last_progress_update = 0
-            last_time_update = time.time()
-            last_log_update = time.time()
+            next_tick_at = 0  # Monotonic time of the next progress update
+            last_log_update = time.monotonic()
             email_count = 0  # Counter for sampling
 
             # Terminal progress update frequency
             terminal_log_interval = 5  # seconds between terminal updates
             log_counter = 0  # For counting processed emails between logs
 
-            # Get initial file position for tracking
-            try:
-                initial_file_pos = self.mbox._file.tell()
-                total_file_size = os.path.getsize(file_path)
-                logger.info(f"Initial file position: {initial_file_pos}, Total file size: {total_file_size}")
-            except:
-                initial_file_pos = 0
-                total_file_size = os.path.getsize(file_path)
-                logger.info(f"Could not get initial file position, using 0. Total file size: {total_file_size}")
-
-            # Process the emails
-            logger.info("Starting to process emails...")
-            for i, message in enumerate(self.mbox):
-                # Check if loading was cancelled
-                if self.loading_cancelled:
-                    logger.info(f"Loading cancelled after {self.emails_loaded:,} emails")
-                    self.queue.put(('status', f"Loading cancelled after {self.emails_loaded:,} emails"))
-                    break
-
-                # Track raw processing count for terminal logs
-                log_counter += 1
-
-                # Apply sampling
-                email_count += 1
-                if sampling_rate > 1 and email_count % sampling_rate != 0:
-                    continue  # Skip this email based on sampling rate
-
-                # For extremely large files, consider random sampling instead of sequential
-                if self.total_emails > 1000000 and sampling_rate > 100:
-                    # Skip with high probability to get a random sample
-                    if random.random() > 1.0 / sampling_rate:
-                        continue
+            # Total file size for position based progress tracking
+            total_file_size = max(1, os.path.getsize(file_path))
+            logger.info(f"Total file size: {total_file_size}")
 
-                # Extract email details
-                try:
-                    email_data = self.extract_email_data(message)
+            # Big files are parsed by worker processes, the scan below hands them batches of
+            # message positions and adds the finished batches in file order
+            pool = None
+            if total_file_size >= PARSE_POOL_MIN_SIZE and (os.cpu_count() or 1) > 1:
+                pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+                logger.info("Parsing emails in worker processes")
+            try:
+                pending = deque()  # Submitted batches, oldest first
+                max_pending = 2 * (os.cpu_count() or 1)
+                batch = []
+
+                # Process the emails
+                logger.info("Starting to process emails...")
+                for i, (offset, from_line, msg_bytes) in enumerate(self.mbox):
+                    # Check if loading was cancelled
+                    if self.loading_cancelled:
+                        logger.info(f"Loading cancelled after {self.emails_loaded:,} emails")
+                        self.queue.put(('status', f"Loading cancelled after {self.emails_loaded:,} emails"))
+                        break
+
+                    # Track raw processing count for terminal logs and sampling
+                    log_counter += 1
+                    email_count += 1
+
+                    # Reading the clock for every email is measurable on big files, so it is only
+                    # read once per 1024 emails, and progress goes out at most every 0.5 seconds
+                    if email_count & 1023 == 0:
+                        current_time = time.monotonic()
+                        if current_time >= next_tick_at:
+                            next_tick_at = current_time + 0.5
+
+                            # Calculate progress based on file position, emails are not counted up front
+                            current_pos = self.mbox.pos
+                            progress_value = min(int((current_pos / total_file_size) * 100), 100)
 
-                    # Check for duplicates using message_id
-                    message_id = email_data['message_id']
-                    if message_id in self.email_id_tracker:
-                        logger.debug(f"Skipping duplicate email with Message-ID: {message_id}")
+                            # Refine the size based estimate with the average email size seen so far
+                            if current_pos > 0:
+                                self.total_emails = int(email_count * total_file_size / current_pos)
+
+                            # Only update if progress has changed
+                            if progress_value == last_progress_update:
+                                progress_value = None
+                            else:
+                                last_progress_update = progress_value
+
+                            # Update status with loading speed
+                            status_text = None
+                            elapsed = current_time - start_time
+                            if elapsed > 0:
+                                emails_per_second = self.emails_loaded / elapsed
+                                if sampling_rate > 1:
+                                    status_text = (
+                                        f"Loaded {self.emails_loaded:,} emails (sampling 1:{sampling_rate}) "
+                                        f"at {emails_per_second:.1f} emails/sec"
+                                    )
+                                else:
+                                    estimated_total_time = self.total_emails / emails_per_second if emails_per_second > 0 else 0
+                                    remaining_time = estimated_total_time - elapsed
+
+                                    status_text = (
+                                        f"Loaded {self.emails_loaded:,} of ~{self.total_emails:,} emails "
+                                        f"({emails_per_second:.1f} emails/sec, "
+                                        f"~{remaining_time / 60:.1f} min remaining)"
+                                    )
+
+                            # Progress and status go out as one message per tick
+                            if progress_value is not None or status_text is not None:
+                                self.queue.put(('tick', (progress_value, status_text)))
+
+                            # Terminal log updates at set interval
+                            if (current_time - last_log_update) > terminal_log_interval:
+                                # Current position in file, maintained by the reader
+                                current_pos = self.mbox.pos
+                                pos_percent = min(100, int((current_pos / total_file_size) * 100))
+
+                                # Calculate processing speed
+                                emails_per_sec = log_counter / (current_time - last_log_update)
+
+                                # Log to terminal
+                                logger.info(
+                                    f"Processed: {log_counter:,} emails since last update "
+                                    f"({emails_per_sec:.1f} emails/sec), "
+                                    f"File position: {current_pos:,}/{total_file_size:,} bytes ({pos_percent}%)"
+                                )
+
+                                # Reset counter
+                                log_counter = 0
+                                last_log_update = current_time
+
+                    # Apply sampling
+                    if sampling_rate > 1 and email_count % sampling_rate != 0:
+                        continue  # Skip this email based on sampling rate
+
+                    if pool is not None:
+                        batch.append((offset, len(msg_bytes)))
+                        if len(batch) >= PARSE_POOL_BATCH:
+                            pending.append(pool.submit(extract_emails, file_path, batch))
+                            batch = []
+                            # Add finished batches, waiting for the oldest once too many are in flight
+                            while pending and (len(pending) > max_pending or pending[0].done()):
+                                for email_data in pending.popleft().result():
+                                    self.add_loaded_email(email_data)
                         continue
-                    else:
-                        self.email_id_tracker.add(message_id)
-
-                    current_chunk.append(email_data)
-                    self.emails_loaded += 1
-                except Exception as e:
-                    logger.error(f"Error processing email #{i}: {str(e)}")
-                    continue
-
-                # If early preview is enabled, start showing emails after a few are loaded
-                if self.emails_loaded == 100 and len(self.emails) == 0:
-                    # Add first batch to display some data quickly
-                    self.emails.extend(current_chunk)
-                    self.queue.put(('preview_emails', None))
-                    logger.info("Showing email preview while continuing to load")
 
-                # Process chunk when it reaches the chunk size
-                if len(current_chunk) >= chunk_size:
-                    self.emails.extend(current_chunk)
-                    current_chunk = []
-
-                # Update progress every 0.5 seconds to avoid UI freezing
-                current_time = time.time()
-
-                # Terminal log updates at set interval
-                if (current_time - last_log_update) > terminal_log_interval:
+                    # Extract email details
                     try:
-                        # Get current position in file
-                        current_pos = self.mbox._file.tell()
-                        pos_percent = min(100, int((current_pos / total_file_size) * 100))
-
-                        # Calculate processing speed
-                        emails_per_sec = log_counter / (current_time - last_log_update)
-
-                        # Log to terminal
-                        logger.info(
-                            f"Processed: {log_counter:,} emails since last update "
-                            f"({emails_per_sec:.1f} emails/sec), "
-                            f"File position: {current_pos:,}/{total_file_size:,} bytes ({pos_percent}%)"
-                        )
-
-                        # Reset counter
-                        log_counter = 0
-                        last_log_update = current_time
+                        email_data = self.extract_email_data(msg_bytes, offset)
                     except Exception as e:
-                        logger.error(f"Error during terminal logging: {str(e)}")
-
-                # Update GUI progress
-                if (current_time - last_time_update) > 0.5:
-                    # Calculate progress based on file position for huge files
-                    if file_size_mb > 1000:
-                        try:
-                            # Try to get current position in file for better progress estimation
-                            current_pos = self.mbox._file.tell()
-                            progress_value = min(int((current_pos / total_file_size) * 100), 100)
-                        except:
-                            # Fallback to email count based progress
-                            progress_value = min(int((self.emails_loaded / (self.total_emails / sampling_rate)) * 100),
-                                                 100)
-                    else:
-                        # Normal progress calculation
-                        progress_value = min(int((self.emails_loaded / (self.total_emails / sampling_rate)) * 100), 100)
-
-                    # Only update if progress has changed
-                    if progress_value != last_progress_update:
-                        self.queue.put(('progress', progress_value))
-                        last_progress_update = progress_value
-
-                    # Update status with loading speed
-                    elapsed = current_time - start_time
-                    if elapsed > 0:
-                        emails_per_second = self.emails_loaded / elapsed
-                        if sampling_rate > 1:
-                            status_text = (
-                                f"Loaded {self.emails_loaded:,} emails (sampling 1:{sampling_rate}) "
-                                f"at {emails_per_second:.1f} emails/sec"
-                            )
-                        else:
-                            estimated_total_time = self.total_emails / emails_per_second if emails_per_second > 0 else 0
-                            remaining_time = estimated_total_time - elapsed
-
-                            status_text = (
-                                f"Loaded {self.emails_loaded:,} of ~{self.total_emails:,} emails "
-                                f"({emails_per_second:.1f} emails/sec, "
-                                f"~{remaining_time / 60:.1f} min remaining)"
-                            )
-
-                        self.queue.put(('status', status_text))
-
-                    last_time_update = current_time
-
-            # Add any remaining emails in the last chunk
-            if current_chunk:
-                self.emails.extend(current_chunk)
+                        logger.error(f"Error processing email #{i}: {str(e)}")
+                        continue
+                    self.add_loaded_email(email_data)
+
+                if pool is not None:
+                    if batch and not self.loading_cancelled:
+                        pending.append(pool.submit(extract_emails, file_path, batch))
+                    while pending and not self.loading_cancelled:
+                        for email_data in pending.popleft().result():
+                            self.add_loaded_email(email_data)
+            finally:
+                # Also on errors and cancelling, the workers hold maps of the file open
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
 
             # Calculate total processing time
-            total_time = time.time() - start_time
+            total_time = time.monotonic() - start_time
 
             # Final terminal log
             logger.info(f"Processing completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -702,62 +1394,146 @@ class MboxManagerApp:
             self.queue.put(('error', error_msg))
             self.queue.put(('cancel_button_state', tk.DISABLED))
 
-    def extract_email_data(self, message):
-        """Extract relevant data from email message"""
-        # Extract From field
-        from_field = message.get('From', '')
-        # Extract To field
-        to_field = message.get('To', '')
-        # Extract Subject field
-        subject = message.get('Subject', '')
-        # Extract Date field
-        date_str = message.get('Date', '')
-        # Extract Message-ID field for duplicate detection
-        message_id = message.get('Message-ID', '')
-
-        # Try to parse the date
-        date_obj = None
+    def add_loaded_email(self, email_data):
+        """Add a parsed email to the store unless its Message-ID was already loaded"""
+        # Check for duplicates using a hash of message_id
+        message_id = email_data['message_id']
+        message_id_hash = hash(message_id)
+        if message_id_hash in self.email_id_tracker:
+            logger.debug(f"Skipping duplicate email with Message-ID: {message_id}")
+            return
+        self.email_id_tracker.add(message_id_hash)
+
+        # Rows go straight into the store's columns, visible to the UI as soon as
+        # they are appended
+        self.emails.append(email_data)
+        self.emails_loaded += 1
+
+        # If early preview is enabled, start showing emails after a few are loaded
+        if self.emails_loaded == 100:
+            # Display the first batch of emails quickly
+            self.queue.put(('preview_emails', None))
+            logger.info("Showing email preview while continuing to load")
+
+    @classmethod
+    def extract_email_data(cls, msg_bytes, offset=0):
+        """Extract relevant data from the raw bytes of an email message"""
+        headers = extract_headers_fast(msg_bytes)
+        from_field = headers.get('from', '')
+        to_field = headers.get('to', '')
+        subject = headers.get('subject', '')
+        date_str = headers.get('date', '')
+        # Message-ID is used for duplicate detection
+        message_id = headers.get('message_id', '')
+
+        # Try to parse the date once here, filters compare the epoch seconds
+        date_epoch = math.nan
         try:
             date_obj = email.utils.parsedate_to_datetime(date_str)
             formatted_date = date_obj.strftime('%Y-%m-%d %H:%M')
-        except:
+            date_epoch = date_obj.timestamp()
+        except (TypeError, ValueError, OverflowError, OSError):
+            # Missing or malformed date, or one outside what the platform's time functions take
             formatted_date = date_str
 
-        # Clean and decode headers if needed
+        # Decode RFC 2047 encoded words, only present in a small share of headers
         try:
-            subject = self.decode_header(subject)
-            from_field = self.decode_header(from_field)
-            to_field = self.decode_header(to_field)
+            if '=?' in subject:
+                subject = cls.decode_header(subject)
+            if '=?' in from_field:
+                from_field = cls.decode_header(from_field)
+            if '=?' in to_field:
+                to_field = cls.decode_header(to_field)
         except Exception as e:
             logger.error(f"Error decoding headers: {str(e)}")
 
         # Generate a unique ID if no Message-ID is available
         if not message_id:
-            # Create a pseudo-unique ID based on headers and content
-            content_hash = hash(f"{from_field}|{to_field}|{subject}|{date_str}|{str(message.get_payload())[:100]}")
-            message_id = f"generated-{content_hash}"
-
-        # Extract message body for content searching
-        body = self.extract_email_body(message)
+            # Create a pseudo-unique ID based on headers and content. BLAKE2b over the bytes
+            # is stable across runs, unlike the per-process salted hash() of a str
+            msg_bytes = bytes(msg_bytes)
+            header_end = header_block_end(msg_bytes)
+            if header_end < 0:
+                body_start = len(msg_bytes)  # Headers only, no body
+            elif msg_bytes.startswith(b'\r\n\r\n', header_end):
+                body_start = header_end + 4
+            else:
+                body_start = header_end + 2
+            content_hash = hashlib.blake2b(digest_size=8)
+            for value in (from_field, to_field, subject, date_str):
+                content_hash.update(value.encode('utf-8', errors='replace'))
+                content_hash.update(b'|')
+            content_hash.update(msg_bytes[body_start:body_start + 100])
+            message_id = f"generated-{content_hash.hexdigest()}"
 
         return {
-            'message': message,
+            'offset': offset,  # Where the message bytes start in the mbox file
+            'length': len(msg_bytes),
             'from': from_field,
             'to': to_field,
             'subject': subject,
             'date_str': date_str,
-            'date_obj': date_obj,
+            'date_epoch': date_epoch,  # NaN when the date could not be parsed
             'formatted_date': formatted_date,
             'message_id': message_id,
-            'body': body  # Store the body content for searching
+            'body': None  # Lowercased body for content searching, extracted on first use
         }
 
-    def extract_email_body(self, message):
+    def load_bodies(self, emails):
+        """
+        Extract and cache the lowercased body of every row that has not been parsed yet,
+        returns the bodies of the rows that existed when called
+        """
+        bodies = emails.cols['body']
+        row_count = len(emails)
+        missing = [row for row in range(row_count) if bodies[row] is None]
+        if len(missing) >= BODY_POOL_MIN_ROWS and (os.cpu_count() or 1) > 1:
+            try:
+                self.load_bodies_parallel(emails, missing)
+            except Exception as e:
+                logger.warning(f"Parallel body extraction failed, continuing in this process: {str(e)}")
+
+        for row in missing:
+            if bodies[row] is None:
+                try:
+                    bodies[row] = body_search_text(emails.get_raw(row))
+                except Exception as e:
+                    if emails.source.closed:
+                        raise  # The file was replaced, no body read from it can be kept
+                    logger.error(f"Error extracting body of email #{row}: {str(e)}")
+                    bodies[row] = ""
+        return bodies[:row_count]
+
+    def load_bodies_parallel(self, emails, rows):
+        """Extract the lowercased bodies of rows in worker processes"""
+        bodies = emails.cols['body']
+        offsets = emails.cols['offset']
+        lengths = emails.cols['length']
+        batches = [rows[i:i + BODY_POOL_BATCH] for i in range(0, len(rows), BODY_POOL_BATCH)]
+        logger.info(f"Extracting {len(rows):,} email bodies in worker processes")
+
+        # Spawn rather than fork, forking a process that runs Tk and other threads is unsafe
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(extract_bodies, emails.source.path,
+                                   [(offsets[row], lengths[row]) for row in batch])
+                       for batch in batches]
+            for batch, future in zip(batches, futures):
+                result = future.result()
+                # The workers read the file by path, once it is closed it may have been replaced
+                if emails.source.closed:
+                    raise ValueError(f"mbox file {emails.source.path} is closed")
+                for row, body in zip(batch, result):
+                    bodies[row] = body
+
+    @staticmethod
+    def extract_email_body(message):
         """Extract the body content from an email message"""
         body = ""
 
         # Try to get plain text content first
         if message.is_multipart():
+            # Collect the parts and join them once instead of growing a string
+            parts = []
             for part in message.walk():
                 content_type = part.get_content_type()
                 content_disposition = str(part.get("Content-Disposition"))
@@ -769,19 +1545,22 @@ class MboxManagerApp:
                 # Get plain text or HTML content
                 if content_type == "text/plain":
                     try:
-                        body_part = part.get_payload(decode=True).decode(errors='replace')
-                        body += body_part + "\n"
+                        parts.append(part.get_payload(decode=True).decode(errors='replace'))
+                        parts.append("\n")
                     except Exception as e:
-                        body += f"[Error decoding plain text content: {str(e)}]\n"
-                elif content_type == "text/html" and not body:
+                        parts.append(f"[Error decoding plain text content: {str(e)}]\n")
+                elif content_type == "text/html" and not parts:
                     # Only use HTML if we don't have plain text
                     try:
-                        html_part = part.get_payload(decode=True).decode(errors='replace')
                         # Simple HTML stripping for search purposes
                         # This is basic and doesn't handle all HTML properly
-                        body += re.sub(r'<[^>]+>', ' ', html_part)
+                        html_part = part.get_payload(decode=True)
+                        html_text = HTML_TAG_BYTES_RE.sub(b' ', html_part).decode(errors='replace')
+                        if html_text:
+                            parts.append(html_text)
                     except Exception as e:
                         pass
+            body = "".join(parts)
         else:
             # Not multipart - try to decode the payload
             try:
@@ -794,7 +1573,8 @@ class MboxManagerApp:
 
         return body
 
-    def decode_header(self, header):
+    @staticmethod
+    def decode_header(header):
         """Decode email header properly"""
         if not header:
             return ""
@@ -806,8 +1586,12 @@ class MboxManagerApp:
 
             for part, encoding in parts:
                 if isinstance(part, bytes):
+                    codec = HEADER_CHARSETS.get(encoding) if encoding else None
+                    if codec:
+                        # Common charset, undecodable bytes are replaced rather than retried
+                        decoded_parts.append(part.decode(codec, errors='replace'))
                     # Try with the specified encoding
-                    if encoding:
+                    elif encoding:
                         try:
                             decoded_parts.append(part.decode(encoding))
                         except (LookupError, UnicodeDecodeError):
@@ -836,17 +1620,60 @@ class MboxManagerApp:
                 return header.decode('utf-8', errors='replace')
             return str(header)
 
+    def tcl_is_threaded(self):
+        """Return True if the Tcl interpreter accepts calls from other threads"""
+        try:
+            return self.root.tk.eval('set tcl_platform(threaded)') == '1'
+        except tk.TclError:
+            return False
+
+    def wake(self, check):
+        """Schedule a single run of a queue check on the Tk thread"""
+        if not self._event_driven:
+            return
+        with self._pending_lock:
+            if check in self._pending_checks:
+                return  # A drain is already scheduled and will pick this item up
+            self._pending_checks.add(check)
+        try:
+            self.root.after_idle(check)
+        except (RuntimeError, tk.TclError):
+            # The main loop has stopped or the window is gone
+            with self._pending_lock:
+                self._pending_checks.discard(check)
+
     def check_queue(self):
         """Check for updates from the worker thread"""
+        # Clear the pending flag first so items put while draining schedule another run
+        with self._pending_lock:
+            self._pending_checks.discard(self.check_queue)
+        latest = {}  # Newest progress/status/cancel button updates not drawn yet
         try:
             while True:
                 action, data = self.queue.get_nowait()
 
-                if action == 'progress':
-                    self.progress['value'] = data
-                    self.progress_percent.config(text=f"{data}%")
-                elif action == 'display_emails':
-                    self.filtered_emails = self.emails.copy()
+                # Only the newest state update of a burst is drawn
+                if action == 'tick':
+                    progress_value, status_text = data
+                    if progress_value is not None:
+                        latest['progress'] = progress_value
+                    if status_text is not None:
+                        latest['status'] = status_text
+                    self.queue.task_done()
+                    continue
+                if action in ('progress', 'status', 'cancel_button_state'):
+                    latest[action] = data
+                    self.queue.task_done()
+                    continue
+                if latest:
+                    # Draw them before anything that may replace the status text
+                    self.show_latest(latest)
+                    latest.clear()
+
+                if action == 'display_emails':
+                    self.filtered_emails = array('I', range(len(self.emails)))
+                    self._filter_cache.clear()
+                    self._filter_gen += 1  # Results computed on a partial load are stale
                     self.update_email_list()
                     self.remove_button.config(state=tk.NORMAL)
                     self.export_button.config(state=tk.NORMAL)
@@ -856,18 +1683,26 @@ class MboxManagerApp:
                     self.update_stats()
                 elif action == 'preview_emails':
                     # Display first batch of emails while still loading
-                    self.filtered_emails = self.emails.copy()
+                    self.filtered_emails = array('I', range(len(self.emails)))
+                    self._filter_cache.clear()
+                    self._filter_gen += 1  # Results computed on a partial load are stale
                     self.update_email_list()
-                    self.remove_button.config(state=tk.NORMAL)
+                    # Remove stays off until loading ends, the loader is still appending to this store
                     self.update_stats()
                     messagebox.showinfo("Preview Available",
                                         "Showing email preview while continuing to load the full file.")
-                elif action == 'status':
-                    self.status_label.config(text=data)
+                elif action == 'filtered':
+                    generation, emails, rows, filter_time = data
+                    # Ignore results superseded by a newer filter or computed on a replaced store
+                    if generation == self._filter_gen and emails is self.emails:
+                        self.show_filter_results(rows, filter_time)
+                elif action == 'rewrite_finished':
+                    self.set_rewriting(False)
+                    if not data:
+                        # The loaded emails no longer match the file
+                        self.discard_emails()
                 elif action == 'error':
                     messagebox.showerror("Error", data)
-                elif action == 'cancel_button_state':
-                    self.cancel_button.config(state=data)
                 elif action == 'success':
                     messagebox.showinfo("Success", data)
 
@@ -875,23 +1710,22 @@ class MboxManagerApp:
         except queue.Empty:
             pass
 
-        # Schedule to check again
-        self.root.after(100, self.check_queue)
+        if latest:
+            self.show_latest(latest)
 
-    def check_log_queue(self):
-        """Check for new log messages"""
-        try:
-            while True:
-                record = self.log_queue.get_nowait()
-                formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-                log_message = formatter.format(record)
-                # Log messages are printed to console but not displayed in UI anymore
-                self.log_queue.task_done()
-        except queue.Empty:
-            pass
+        # Without thread-aware Tcl, schedule to check again
+        if not self._event_driven:
+            self.root.after(100, self.check_queue)
 
-        # Schedule to check again
-        self.root.after(100, self.check_log_queue)
+    def show_latest(self, latest):
+        """Apply the coalesced progress, status and cancel button updates"""
+        if 'progress' in latest:
+            self.progress['value'] = latest['progress']
+            self.progress_percent.config(text=f"{latest['progress']}%")
+        if 'status' in latest:
+            self.status_label.config(text=latest['status'])
+        if 'cancel_button_state' in latest:
+            self.cancel_button.config(state=latest['cancel_button_state'])
 
     def clear_log(self):
         """Clear the log (kept for compatibility)"""
@@ -969,14 +1803,13 @@ class MboxManagerApp:
 
     def update_email_list(self):
         """Update the email list treeview with pagination"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Clear the mapping dictionary
+        # Clear the current selection and the mapping dictionary
+        self.tree.selection_remove(self.tree.selection())
         self.tree_item_to_email = {}
 
         if not self.filtered_emails:
+            # Detach the pooled items so they can be reused on the next page
+            self.tree.set_children('')
             self.page_label.config(text="Page 0 of 0")
             self.prev_button.config(state=tk.DISABLED)
             self.next_button.config(state=tk.DISABLED)
@@ -995,21 +1828,37 @@ class MboxManagerApp:
         start_idx = self.current_page * self.emails_per_page
         end_idx = min(start_idx + self.emails_per_page, len(self.filtered_emails))
 
-        # Add the filtered emails for the current page to the treeview
-        for i, email_data in enumerate(self.filtered_emails[start_idx:end_idx]):
-            actual_idx = start_idx + i
-            item_id = self.tree.insert('', tk.END, values=(
-                email_data['from'],
-                email_data['to'],
-                email_data['subject'],
-                email_data['formatted_date']
-            ))
+        # Build the row values for the current page up front
+        page_rows = self.filtered_emails[start_idx:end_idx]
+        from_col = self.emails.cols['from']
+        to_col = self.emails.cols['to']
+        subject_col = self.emails.cols['subject']
+        date_col = self.emails.cols['formatted_date']
+        page_values = [(from_col[row], to_col[row], subject_col[row], date_col[row]) for row in page_rows]
+
+        # Grow the item pool if this page is longer than any shown so far
+        pool = self._tree_items
+        while len(pool) < len(page_values):
+            pool.append(self.tree.insert('', tk.END))
+
+        # Refill pooled items with the current page and attach exactly those, in order
+        set_item = self.tree.item
+        selected_items = []
+        for actual_idx, item_id, values in zip(count(start_idx), pool, page_values):
+            set_item(item_id, values=values)
             # Store the mapping from tree item to email index in filtered_emails
             self.tree_item_to_email[item_id] = actual_idx
 
             # If this email is in our selected set, make sure it appears selected
             if actual_idx in self.selected_email_indices:
-                self.tree.selection_add(item_id)
+                selected_items.append(item_id)
+
+        self.tree.set_children('', *pool[:len(page_values)])
+        self.tree.yview_moveto(0)
+
+        # Select in one call so only a single selection event is generated
+        if selected_items:
+            self.tree.selection_add(selected_items)
 
         # Update pagination controls
         self.page_label.config(text=f"Page {self.current_page + 1} of {self.total_pages}")
@@ -1038,68 +1887,32 @@ class MboxManagerApp:
             # Store this selection in our global tracking set
             self.selected_email_indices.add(actual_index)
 
-            if 0 <= actual_index < len(self.filtered_emails):
-                # Get the email data
-                email_data = self.filtered_emails[actual_index]
+            if self.rewriting:
+                # The messages are being moved within the file, their bytes can't be read yet
+                self.email_text.config(state=tk.NORMAL)
+                self.email_text.delete(1.0, tk.END)
+                self.email_text.insert(tk.END, "Email content is unavailable while the file is being modified")
+                self.email_text.config(state=tk.DISABLED)
+            elif 0 <= actual_index < len(self.filtered_emails):
+                # Get the email's row in the store
+                row = self.filtered_emails[actual_index]
+                cols = self.emails.cols
 
                 # Update headers
-                self.header_from.config(text=f"From: {email_data['from']}")
-                self.header_to.config(text=f"To: {email_data['to']}")
-                self.header_subject.config(text=f"Subject: {email_data['subject']}")
-                self.header_date.config(text=f"Date: {email_data['formatted_date']}")
+                self.header_from.config(text=f"From: {cols['from'][row]}")
+                self.header_to.config(text=f"To: {cols['to'][row]}")
+                self.header_subject.config(text=f"Subject: {cols['subject'][row]}")
+                self.header_date.config(text=f"Date: {cols['formatted_date'][row]}")
 
                 # Add the message ID for debugging if available
-                message_id = email_data.get('message_id', '')
+                message_id = cols['message_id'][row]
                 if message_id:
                     message_id_text = f"Message-ID: {message_id[:50]}{'...' if len(message_id) > 50 else ''}"
                     logger.debug(message_id_text)
 
-                # Get the email message
-                message = email_data['message']
-
-                # Extract body content
-                body = ""
-
-                # Try to get plain text content first
-                if message.is_multipart():
-                    for part in message.walk():
-                        content_type = part.get_content_type()
-                        content_disposition = str(part.get("Content-Disposition"))
-
-                        # Skip attachments
-                        if "attachment" in content_disposition:
-                            continue
-
-                        # Get plain text or HTML content
-                        if content_type == "text/plain":
-                            try:
-                                body_part = part.get_payload(decode=True).decode(errors='replace')
-                                body += body_part + "\n"
-                            except Exception as e:
-                                body += f"[Error decoding plain text content: {str(e)}]\n"
-                        elif content_type == "text/html" and not body:
-                            # Only use HTML if we don't have plain text
-                            try:
-                                html_part = part.get_payload(decode=True).decode(errors='replace')
-                                body += f"[HTML Content Available - Showing raw HTML]\n{html_part}\n"
-                            except Exception as e:
-                                body += f"[Error decoding HTML content: {str(e)}]\n"
-                else:
-                    # Not multipart - try to decode the payload
-                    try:
-                        body = message.get_payload(decode=True).decode(errors='replace')
-                    except Exception as e:
-                        body = f"[Error decoding message content: {str(e)}]"
-
-                        # Fallback to non-decoded content
-                        try:
-                            body = message.get_payload()
-                        except:
-                            body = "[Could not retrieve message content]"
-
-                # If no body found, show a message
-                if not body:
-                    body = "[No readable content found in this email]"
+                # Body text is cached per store and row, keyed on the store so a replaced
+                # store never returns stale text
+                body = self.render_email_body(self.emails, row)
 
                 # Update the email text widget
                 self.email_text.config(state=tk.NORMAL)
@@ -1118,8 +1931,74 @@ class MboxManagerApp:
             self.email_text.insert(tk.END, "No email selected")
             self.email_text.config(state=tk.DISABLED)
 
+    @functools.lru_cache(maxsize=128)
+    def render_email_body(self, emails, row):
+        """Return the display text of an email, cached so moving between emails does not parse them again"""
+        # Parse the email message from its raw bytes
+        message = email.message_from_bytes(emails.get_raw(row))
+
+        # Extract body content
+        body = ""
+
+        # Try to get plain text content first
+        if message.is_multipart():
+            # Collect the parts and join them once instead of growing a string
+            parts = []
+            for part in message.walk():
+                content_type = part.get_content_type()
+                content_disposition = str(part.get("Content-Disposition"))
+
+                # Skip attachments
+                if "attachment" in content_disposition:
+                    continue
+
+                # Get plain text or HTML content
+                if content_type == "text/plain":
+                    try:
+                        parts.append(part.get_payload(decode=True).decode(errors='replace'))
+                        parts.append("\n")
+                    except Exception as e:
+                        parts.append(f"[Error decoding plain text content: {str(e)}]\n")
+                elif content_type == "text/html" and not parts:
+                    # Only use HTML if we don't have plain text
+                    try:
+                        html_part = part.get_payload(decode=True).decode(errors='replace')
+                        parts.append(f"[HTML Content Available - Showing raw HTML]\n{html_part}\n")
+                    except Exception as e:
+                        parts.append(f"[Error decoding HTML content: {str(e)}]\n")
+            body = "".join(parts)
+        else:
+            # Not multipart - try to decode the payload
+            try:
+                body = message.get_payload(decode=True).decode(errors='replace')
+            except Exception as e:
+                body = f"[Error decoding message content: {str(e)}]"
+
+                # Fallback to non-decoded content
+                try:
+                    body = message.get_payload()
+                except:
+                    body = "[Could not retrieve message content]"
+
+        # If no body found, show a message
+        if not body:
+            body = "[No readable content found in this email]"
+
+        return body
+
+    def schedule_filters(self, event=None):
+        """Apply filters once typing pauses, so a burst of keystrokes triggers a single pass"""
+        if self._filter_job:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(self.filter_delay_ms, self.apply_filters)
+
     def apply_filters(self, event=None):
         """Apply filters to the email list with support for 'does not contain' mode"""
+        # Drop any pending debounced run, this one covers it
+        if self._filter_job:
+            self.root.after_cancel(self._filter_job)
+            self._filter_job = None
+
         if not self.emails:
             return
 
@@ -1135,13 +2014,13 @@ class MboxManagerApp:
         to_mode = self.to_filter_mode.get()
         content_mode = self.content_filter_mode.get()  # Content filter mode
 
-        # Parse date filter if present
-        date_obj = None
+        # Parse date filter if present, as epoch seconds to compare with the date column
+        date_cutoff = None
         if date_filter:
             try:
-                date_obj = datetime.strptime(date_filter, '%Y-%m-%d')
-            except ValueError:
-                pass
+                date_cutoff = datetime.strptime(date_filter, '%Y-%m-%d').timestamp()
+            except (ValueError, OSError, OverflowError):
+                pass  # Not a date yet, or one before 1970 that Windows' local time functions reject
 
         # Process content filter words (comma-separated)
         content_words = []
@@ -1149,6 +2028,25 @@ class MboxManagerApp:
             content_words = [word.strip() for word in content_filter.split(',')]
             content_words = [word for word in content_words if word]  # Remove empty strings
 
+        # Each active filter is identified by its field, mode and value
+        filter_specs = []
+        if subject_filter:
+            filter_specs.append(('subject', subject_mode, subject_filter))
+        if from_filter:
+            filter_specs.append(('from', from_mode, from_filter))
+        if to_filter:
+            filter_specs.append(('to', to_mode, to_filter))
+        if date_cutoff is not None:
+            # Date filter - no "does not contain" option for dates
+            filter_specs.append(('date', None, date_cutoff))
+        if content_words:
+            filter_specs.append(('content', content_mode, tuple(content_words)))
+
+        # Keys that leave the filters as they were (arrows, Shift, Home...) must not
+        # reset the page and selection. Anything that changes the list bumps the generation
+        if (filter_specs, self.emails, len(self.emails), self._filter_gen) == self._filter_request:
+            return
+
         # Log filter application
         logger.info(f"Applying filters: Subject[{subject_mode}]='{subject_filter}', "
                     f"From[{from_mode}]='{from_filter}', "
@@ -1156,54 +2054,72 @@ class MboxManagerApp:
                     f"Content[{content_mode}]='{content_filter}', "
                     f"Date after='{date_filter}'")
 
-        # Apply filters
-        start_time = time.time()
-        self.filtered_emails = []
-        filter_count = 0
-
         # Clear selection tracking when filters change
         self.selected_email_indices.clear()
 
-        for email_data in self.emails:
-            # Subject filter
-            if subject_filter:
-                subject_contains = subject_filter in email_data['subject'].lower()
-                if ((subject_mode == "contains" and not subject_contains) or
-                        (subject_mode == "does not contain" and subject_contains)):
-                    continue
-
-            # From filter
-            if from_filter:
-                from_contains = from_filter in email_data['from'].lower()
-                if ((from_mode == "contains" and not from_contains) or
-                        (from_mode == "does not contain" and from_contains)):
-                    continue
-
-            # To filter
-            if to_filter:
-                to_contains = to_filter in email_data['to'].lower()
-                if ((to_mode == "contains" and not to_contains) or
-                        (to_mode == "does not contain" and to_contains)):
-                    continue
+        # Hand the work to the filter thread, results come back through self.queue.
+        # Bumping the generation makes any result still in flight stale
+        self._filter_gen += 1
+        self._filter_request = (filter_specs, self.emails, len(self.emails), self._filter_gen)
+        self._filter_queue.put((filter_specs, self.emails, self._filter_gen))
+        self.status_label.config(text="Filtering...")
 
-            # Date filter - no "does not contain" option for dates
-            if date_obj and email_data['date_obj'] and email_data['date_obj'] < date_obj:
-                continue
+    def filter_worker(self):
+        """Worker thread that computes filter results off the UI thread"""
+        while True:
+            task = self._filter_queue.get()
 
-            # Content filter (comma-separated words)
-            if content_words:
-                body_lower = email_data.get('body', '').lower()
-                if content_mode == "contains":
-                    # All words must be found in the content
-                    if not all(word in body_lower for word in content_words):
-                        continue
-                else:  # "does not contain"
-                    # None of the words should be in the content
-                    if any(word in body_lower for word in content_words):
-                        continue
+            # Only the most recent request matters, skip any that were superseded
+            try:
+                while True:
+                    task = self._filter_queue.get_nowait()
+            except queue.Empty:
+                pass
 
-            self.filtered_emails.append(email_data)
-            filter_count += 1
+            filter_specs, emails, generation = task
+            try:
+                start_time = time.time()
+
+                # Intersect the matches of every active filter. A filter's matches are cached and only
+                # recomputed when its text or mode changes, so typing in one field does not rescan the others
+                matching = None
+                for spec in sorted(filter_specs, key=lambda spec: self.filter_priority(emails, spec)):
+                    if generation != self._filter_gen:
+                        break  # A newer filter request replaces this one
+                    if matching is not None and not matching:
+                        continue  # Nothing left to narrow down, the remaining filters need not run
+
+                    cached = self._filter_cache.get(spec[0])
+                    if cached is None or cached[:3] != (spec, emails, len(emails)):
+                        cached = (spec, emails, len(emails), self.match_filter(emails, *spec))
+                        self._filter_cache[spec[0]] = cached
+                    matching = cached[3] if matching is None else matching & cached[3]
+                else:
+                    if matching is None:
+                        rows = array('I', range(len(emails)))
+                    else:
+                        rows = array('I', sorted(matching))
+                    self.queue.put(('filtered', (generation, emails, rows, time.time() - start_time)))
+            except Exception as e:
+                error_msg = f"Error applying filters: {str(e)}"
+                logger.error(error_msg)
+                logger.error(traceback.format_exc())
+                # Only the latest request is waiting on the status, a superseded one fails quietly
+                if generation == self._filter_gen:
+                    self.queue.put(('error', error_msg))
+                    self.queue.put(('status', "Filtering failed"))
+
+    def filter_priority(self, emails, spec):
+        """Sort key running cached filters first, fewest matches first, then the rest cheapest first"""
+        cached = self._filter_cache.get(spec[0])
+        if cached is not None and cached[:3] == (spec, emails, len(emails)):
+            return 0, len(cached[3])
+        return 1, FILTER_COSTS[spec[0]]
+
+    def show_filter_results(self, rows, filter_time):
+        """Display the rows matched by the filter thread"""
+        self.filtered_emails = rows
+        filter_count = len(self.filtered_emails)
 
         # Reset pagination for new filter
         self.current_page = 0
@@ -1214,10 +2130,52 @@ class MboxManagerApp:
         self.update_email_list()
         self.update_stats()
 
-        filter_time = time.time() - start_time
         logger.info(f"Filter applied in {filter_time:.2f}s: {filter_count:,} emails matched")
         self.status_label.config(text=f"Showing {len(self.filtered_emails):,} emails (filtered in {filter_time:.2f}s)")
 
+    def match_filter(self, emails, field, mode, value):
+        """Return the set of row ids in the email store that pass a single filter"""
+        if field == 'date':
+            # Emails without a parsable date (NaN) are kept
+            return emails.rows_since(value)
+
+        if field == 'content':
+            bodies = self.load_bodies(emails)
+            emails.update_token_index(bodies)
+            keep_matches = mode == "contains"
+
+            # Words the token index can answer are looked up there first
+            rows = None
+            found = [emails.rows_with_word(word) for word in value if emails.can_use_index(word)]
+            if found:
+                if keep_matches:
+                    # All words must be found in the content
+                    rows = set.intersection(*found)
+                else:
+                    # None of the words should be in the content
+                    rows = set(range(len(bodies))).difference(*found)
+
+            # Remaining words scan the bodies, only those of the rows still left once there are some
+            for word in value:
+                if not emails.can_use_index(word):
+                    rows = self.scan_rows(bodies, word, keep_matches, rows)
+            return rows
+
+        return self.scan_rows(emails.lowered(field), value, mode == "contains")
+
+    def scan_rows(self, texts, value, keep_matches, rows=None):
+        """Return the row ids of texts, or of only the given rows, that do (or don't) contain value"""
+        if rows is None:
+            rows = count()
+        else:
+            rows = list(rows)
+            texts = map(texts.__getitem__, rows)
+        # map() and compress() run the per-row test in C rather than as a Python level loop
+        matches = map(contains, texts, repeat(value))
+        if not keep_matches:
+            matches = map(not_, matches)
+        return set(compress(rows, matches))
+
     def clear_filters(self):
         """Clear all filters"""
         self.subject_filter.delete(0, tk.END)
@@ -1234,8 +2192,11 @@ class MboxManagerApp:
 
         logger.info("Filters cleared")
 
+        # Discard any filter result still in flight
+        self._filter_gen += 1
+
         if self.emails:
-            self.filtered_emails = self.emails.copy()
+            self.filtered_emails = array('I', range(len(self.emails)))
 
             # Reset pagination
             self.current_page = 0
@@ -1252,21 +2213,6 @@ class MboxManagerApp:
         if self.select_all_mode.get() == "all pages" and self.selected_email_indices:
             # Calculate which emails to remove
             to_remove = list(self.selected_email_indices)
-            to_remove.sort(reverse=True)  # Sort in reverse for safe removal
-
-            removed_count = 0
-            # Remove emails from filtered_emails
-            for idx in to_remove:
-                if 0 <= idx < len(self.filtered_emails):
-                    email_to_remove = self.filtered_emails[idx]
-
-                    # Also remove from the main emails list if present
-                    if email_to_remove in self.emails:
-                        self.emails.remove(email_to_remove)
-
-                    # Remove from filtered list
-                    del self.filtered_emails[idx]
-                    removed_count += 1
 
             # Clear the selection tracking set
             self.selected_email_indices.clear()
@@ -1278,29 +2224,30 @@ class MboxManagerApp:
                 return
 
             # Get the indices of the selected items from our mapping
-            selected_indices = []
+            to_remove = []
             for item in selected_items:
                 if item in self.tree_item_to_email:
                     idx = self.tree_item_to_email[item]
-                    selected_indices.append(idx)
+                    to_remove.append(idx)
                     # Also remove from our global selection set if present
-                    if idx in self.selected_email_indices:
-                        self.selected_email_indices.remove(idx)
+                    self.selected_email_indices.discard(idx)
 
-            # Sort in reverse order to avoid index issues when removing
-            selected_indices.sort(reverse=True)
+        # Map positions in filtered_emails to row ids in the store
+        remove_rows = {self.filtered_emails[idx] for idx in to_remove if 0 <= idx < len(self.filtered_emails)}
+        removed_count = len(remove_rows)
 
-            # Remove emails from filtered_emails
-            removed_count = 0
-            for idx in selected_indices:
-                if 0 <= idx < len(self.filtered_emails):
-                    # Also remove from the main emails list if present
-                    email_to_remove = self.filtered_emails[idx]
-                    if email_to_remove in self.emails:
-                        self.emails.remove(email_to_remove)
+        # Rebuild the store without the removed rows and renumber the filtered row ids
+        keep_mask = bytearray(b'\x01') * len(self.emails)
+        for row in remove_rows:
+            keep_mask[row] = 0
+        keep_rows = list(compress(range(len(self.emails)), keep_mask))
+        new_row_ids = {row: new_row for new_row, row in enumerate(keep_rows)}
+        self.filtered_emails = array('I', [new_row_ids[row] for row in self.filtered_emails if row in new_row_ids])
+        self.emails = self.emails.take(keep_rows)
+        self.render_email_body.cache_clear()
 
-                    del self.filtered_emails[idx]
-                    removed_count += 1
+        # Cached filter results index into the old email list
+        self._filter_cache.clear()
 
         # Recalculate pagination
         self.total_pages = max(1, (len(self.filtered_emails) + self.emails_per_page - 1) // self.emails_per_page)
@@ -1324,7 +2271,7 @@ class MboxManagerApp:
             return
 
         # Get the original file path
-        original_file_path = self.mbox._path
+        original_file_path = self.mbox.path
 
         # Ask if user wants to modify original or create new file
         option = messagebox.askyesnocancel(
@@ -1350,7 +2297,7 @@ class MboxManagerApp:
             return
 
         # Get the original file path for default name suggestion
-        original_file_path = self.mbox._path
+        original_file_path = self.mbox.path
         original_file_name = os.path.basename(original_file_path)
         base_name, ext = os.path.splitext(original_file_name)
         default_name = f"{base_name}_filtered{ext}"
@@ -1378,52 +2325,59 @@ class MboxManagerApp:
     def export_to_new_file_worker(self, new_file_path):
         """Worker thread to export filtered emails to a new file"""
         try:
-            # Create a new mbox file
-            new_mbox = mailbox.mbox(new_file_path)
-            new_mbox.clear()
-
-            total_emails = len(self.filtered_emails)
-            start_time = time.time()
+            # The store may be replaced while exporting, the rows belong to this one
+            emails = self.emails
+            rows = emails.file_order(self.filtered_emails)
+            total_emails = len(rows)
+            file_name = os.path.basename(new_file_path)
+            start_time = time.monotonic()
             last_update_time = start_time
 
+            # Only the changing numbers are formatted on each progress update
+            status_template = f"Exported {{:,}} of {total_emails:,} emails ({{:.1f}} emails/sec)"
+
             logger.info(f"Exporting {total_emails:,} emails to new file: {new_file_path}")
             logger.info(f"Export started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-            for i, email_data in enumerate(self.filtered_emails):
-                # Add the message to the new mbox
-                new_mbox.add(email_data['message'])
-
-                # Update progress every 100 emails or 0.5 seconds
-                current_time = time.time()
-                if i % 100 == 0 or (current_time - last_update_time) > 0.5:
-                    progress_value = min(int((i + 1) / total_emails * 100), 100)
-                    self.queue.put(('progress', progress_value))
-
-                    # Update status with processing speed
-                    if (current_time - start_time) > 0:
-                        emails_per_second = (i + 1) / (current_time - start_time)
-                        status_text = (
-                            f"Exported {i + 1:,} of {total_emails:,} emails "
-                            f"({emails_per_second:.1f} emails/sec)"
-                        )
-                        self.queue.put(('status', status_text))
-
-                    last_update_time = current_time
-
-            # Flush changes to disk
-            new_mbox.flush()
-            new_mbox.close()
-
-            export_time = time.time() - start_time
-            result_msg = f"Exported {total_emails:,} emails to {os.path.basename(new_file_path)} in {export_time:.1f}s"
+            # Write the new mbox file directly, the messages are already mbox formatted bytes
+            with open_for_writing(new_file_path) as new_mbox:
+                # The message lengths alone come close, the truncate below drops any excess
+                preallocate(new_mbox, sum(map(emails.cols['length'].__getitem__, rows)))
+                with emails.entry_writer(new_mbox) as writer:
+                    # The clock is read once per batch of emails rather than for every email
+                    for batch_start in range(0, total_emails, EXPORT_PROGRESS_BATCH):
+                        # Add the messages to the new mbox, copying their file ranges
+                        emails.write_entries(writer, rows[batch_start:batch_start + EXPORT_PROGRESS_BATCH])
+
+                        # Update progress at most every 0.5 seconds
+                        current_time = time.monotonic()
+                        if current_time - last_update_time > 0.5:
+                            exported = min(batch_start + EXPORT_PROGRESS_BATCH, total_emails)
+                            progress_value = min(int(exported / total_emails * 100), 100)
+
+                            # Update status with processing speed, sent with the progress as one tick
+                            emails_per_second = exported / (current_time - start_time)
+                            status_text = status_template.format(exported, emails_per_second)
+                            self.queue.put(('tick', (progress_value, status_text)))
+
+                            last_update_time = current_time
+
+                # Flush changes to disk, dropping any reserved space that wasn't written
+                new_mbox.flush()
+                new_mbox.truncate()
+                os.fsync(new_mbox.fileno())
+                # The export is not read again here, drop its now clean pages from the page cache
+                fadvise(new_mbox.fileno(), 'POSIX_FADV_DONTNEED')
+
+            export_time = time.monotonic() - start_time
+            result_msg = f"Exported {total_emails:,} emails to {file_name} in {export_time:.1f}s"
             logger.info(result_msg)
             logger.info(f"Export completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            self.queue.put(('status', result_msg))
-            self.queue.put(('progress', 100))
+            self.queue.put(('tick', (100, result_msg)))
 
             # Show a success message
             self.queue.put(
-                ('success', f"Successfully exported {total_emails:,} emails to {os.path.basename(new_file_path)}"))
+                ('success', f"Successfully exported {total_emails:,} emails to {file_name}"))
 
         except Exception as e:
             error_msg = f"Error exporting to new file: {str(e)}"
@@ -1439,7 +2393,7 @@ class MboxManagerApp:
             return
 
         # Get the original file path
-        original_file_path = self.mbox._path
+        original_file_path = self.mbox.path
 
         # Confirm with the user that they want to modify the original file
         result = messagebox.askokcancel(
@@ -1469,42 +2423,19 @@ class MboxManagerApp:
             )
 
             if backup_path:
-                # Create backup
+                # Copy in the worker thread so the UI keeps responding, then modify from there
+                self.set_rewriting(True)
                 self.status_label.config(text="Creating backup...")
                 self.progress['value'] = 0
                 self.progress_percent.config(text="0%")
 
-                try:
-                    # Simple file copy for backup
-                    with open(original_file_path, 'rb') as src, open(backup_path, 'wb') as dst:
-                        # Get file size for progress tracking
-                        file_size = os.path.getsize(original_file_path)
-                        bytes_copied = 0
-                        buffer_size = 1024 * 1024  # 1MB buffer
-
-                        while True:
-                            buffer = src.read(buffer_size)
-                            if not buffer:
-                                break
-
-                            dst.write(buffer)
-                            bytes_copied += len(buffer)
-
-                            # Update progress
-                            progress = min(int((bytes_copied / file_size) * 100), 100)
-                            self.progress['value'] = progress
-                            self.progress_percent.config(text=f"{progress}%")
-                            self.root.update_idletasks()  # Force UI update
-
-                    logger.info(f"Created backup at: {backup_path}")
-                    self.status_label.config(text=f"Backup created at {os.path.basename(backup_path)}")
-                except Exception as e:
-                    error_msg = f"Error creating backup: {str(e)}"
-                    logger.error(error_msg)
-                    messagebox.showerror("Backup Error", error_msg)
-                    return
+                backup_thread = threading.Thread(target=self.backup_and_modify, args=(original_file_path, backup_path))
+                backup_thread.daemon = True
+                backup_thread.start()
+                return
 
         # Proceed with modifying the original file
+        self.set_rewriting(True)
         self.status_label.config(text="Modifying original mbox file...")
         self.progress['value'] = 0
         self.progress_percent.config(text="0%")
@@ -1514,117 +2445,304 @@ class MboxManagerApp:
         modify_thread.daemon = True
         modify_thread.start()
 
-    def modify_original_mbox(self, file_path):
-        """Modify the original mbox file to keep only the filtered emails"""
+    def set_rewriting(self, rewriting):
+        """Disable the controls that read or replace the loaded emails while the original file is rewritten"""
+        self.rewriting = rewriting
+        state = tk.DISABLED if rewriting else tk.NORMAL
+        for widget in (self.browse_button, self.remove_button, self.export_button, self.subject_filter,
+                       self.from_filter, self.to_filter, self.date_filter, self.content_filter,
+                       self.clear_filter_button):
+            widget.config(state=state)
+        for combobox in (self.subject_filter_mode_combobox, self.from_filter_mode_combobox,
+                         self.to_filter_mode_combobox, self.content_filter_mode_combobox):
+            combobox.config(state=tk.DISABLED if rewriting else "readonly")
+        if rewriting:
+            # A filter still running must not show results for the emails being moved
+            self._filter_gen += 1
+
+    def discard_emails(self):
+        """Drop loaded emails that no longer match their file, until it is loaded again"""
+        if self.mbox:
+            self.mbox.close()
+        self.mbox = None
+        self.emails = EmailStore()
+        self.filtered_emails = array('I')
+        self._filter_cache.clear()
+        self._filter_gen += 1
+        self.render_email_body.cache_clear()
+        self.selected_email_indices.clear()
+        self.current_page = 0
+        self.update_email_list()
+        self.update_stats()
+        self.remove_button.config(state=tk.DISABLED)
+        self.export_button.config(state=tk.DISABLED)
+
+    def backup_and_modify(self, file_path, backup_path):
+        """Worker thread that backs up the original file, then modifies it"""
         try:
-            # Create a temporary file
-            temp_file_path = file_path + ".temp"
+            self.copy_file(file_path, backup_path)
+            logger.info(f"Created backup at: {backup_path}")
+        except Exception as e:
+            error_msg = f"Error creating backup: {str(e)}"
+            logger.error(error_msg)
+            self.queue.put(('error', error_msg))
+            self.queue.put(('status', "Backup failed, original file unchanged"))
+            self.queue.put(('rewrite_finished', True))
+            return
+
+        self.queue.put(('tick', (0, f"Backup created at {os.path.basename(backup_path)}, modifying original mbox file...")))
+        # With a backup to fall back on, the file is rewritten in place rather than copied first
+        self.modify_original_mbox(file_path, backup_path)
 
-            # Create a new mbox file
-            temp_mbox = mailbox.mbox(temp_file_path)
-            temp_mbox.clear()
+    def copy_file(self, src_path, dst_path):
+        """Copy a file without passing its data through Python where the platform allows, posting progress"""
+        file_size = os.path.getsize(src_path)
+        # Unbuffered, so sendfile() and the read/write fallback share the same file offsets
+        with open(src_path, 'rb', buffering=0) as src, open(dst_path, 'wb', buffering=0) as dst:
+            fadvise(src.fileno(), 'POSIX_FADV_SEQUENTIAL')
 
-            total_emails = len(self.filtered_emails)
-            start_time = time.time()
+            # A copy-on-write clone shares the data blocks and completes at once
+            if fcntl is not None:
+                try:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                    return
+                except OSError:
+                    pass
+
+            use_sendfile = sys.platform.startswith('linux')
+            buffer = None  # Reused for every read when copying through user space
+            copied = 0
+            last_update_time = 0
+            while copied < file_size:
+                if use_sendfile:
+                    try:
+                        sent = os.sendfile(dst.fileno(), src.fileno(), copied, MBOX_IO_BUFFER_SIZE)
+                    except OSError:
+                        # Not supported for this file system, copy through user space instead
+                        use_sendfile = False
+                        src.seek(copied)
+                        dst.seek(copied)
+                        continue
+                else:
+                    if buffer is None:
+                        buffer = memoryview(bytearray(io_buffer_size(dst_path)))
+                    sent = src.readinto(buffer)
+                    # Unbuffered writes may be partial
+                    written = 0
+                    while written < sent:
+                        written += dst.write(buffer[written:sent])
+                if not sent:
+                    break  # The file shrank while copying
+                copied += sent
+
+                # Progress at most 10 times a second
+                current_time = time.monotonic()
+                if current_time - last_update_time > 0.1:
+                    progress_value = min(int(copied / file_size * 100), 100)
+                    self.queue.put(('tick', (progress_value, f"Creating backup... {progress_value}%")))
+                    last_update_time = current_time
+
+            # The backup is not read again, keep it from pushing the mbox out of the page cache
+            fadvise(dst.fileno(), 'POSIX_FADV_DONTNEED')
+
+    def modify_original_mbox(self, file_path, backup_path=None):
+        """
+        Modify the original mbox file to keep only the filtered emails. With a backup the
+        emails may be moved down within the original instead of written to a temp file
+        """
+        emails_valid = True  # Whether the loaded emails still match the file when done
+        rewriting_original = False
+        try:
+            # Create a temporary file, unless the kept emails can be moved down within the original.
+            # That needs no extra disk space, but a failure part way leaves the file incomplete
+            temp_file_path = file_path + ".temp"
+            # The store may be replaced while modifying, the rows belong to this one
+            emails = self.emails
+            rows = emails.file_order(self.filtered_emails)
+            # Where the messages will be once written, worked out before the original can change
+            new_offsets, new_lengths, new_size = emails.framed_layout(rows)
+            in_place = backup_path is not None and emails.can_rewrite_in_place(rows, new_offsets)
+
+            total_emails = len(rows)
+            start_time = time.monotonic()
             last_update_time = start_time
             last_log_update = start_time
-            log_counter = 0
+            last_log_count = 0
+            # Progress lines are only built when something will print them
+            log_progress = logger.isEnabledFor(logging.INFO)
+            total_text = f"{total_emails:,}"
+
+            # Only the changing numbers are formatted on each progress update
+            status_template = (
+                f"Processed {{:,}} of {total_text} emails "
+                f"({{:.1f}} emails/sec, ~{{:.1f}} min remaining)"
+            )
 
             logger.info(f"Starting to modify original mbox file: {file_path}")
-            logger.info(f"Keeping {total_emails:,} emails")
+            logger.info(f"Keeping {total_text} emails")
             logger.info(f"Modification started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-            for i, email_data in enumerate(self.filtered_emails):
-                # Add the message to the temp mbox
-                temp_mbox.add(email_data['message'])
+            # Write the new mbox file directly, the messages are already mbox formatted bytes
+            if in_place:
+                temp_mbox = open(file_path, 'r+b', buffering=io_buffer_size(file_path))
+                rewriting_original = True
+                emails_valid = False
+            else:
+                temp_mbox = open_for_writing(temp_file_path)
+                preallocate(temp_mbox, new_size)
+            with temp_mbox:
+                with emails.entry_writer(temp_mbox) as writer:
+                    # The clock is read once per batch of emails rather than for every email
+                    for batch_start in range(0, total_emails, EXPORT_PROGRESS_BATCH):
+                        # Add the messages to the temp mbox, copying their file ranges
+                        emails.write_entries(writer, rows[batch_start:batch_start + EXPORT_PROGRESS_BATCH])
+                        processed = min(batch_start + EXPORT_PROGRESS_BATCH, total_emails)
+                        current_time = time.monotonic()
+
+                        # Terminal log updates every 5 seconds
+                        if log_progress and (current_time - last_log_update) > 5:
+                            log_counter = processed - last_log_count
+                            emails_per_sec = log_counter / (current_time - last_log_update)
+
+                            # Log to terminal
+                            logger.info(
+                                f"Processed: {log_counter:,} emails since last update "
+                                f"({emails_per_sec:.1f} emails/sec), "
+                                f"Progress: {processed:,}/{total_text} ({min(100, int(processed / total_emails * 100))}%)"
+                            )
 
-                # Count for terminal logging
-                log_counter += 1
+                            last_log_count = processed
+                            last_log_update = current_time
 
-                # Update progress every 0.5 seconds
-                current_time = time.time()
+                        # Update GUI progress at most every 0.5 seconds
+                        if (current_time - last_update_time) > 0.5:
+                            progress_value = min(int(processed / total_emails * 100), 100)
 
-                # Terminal log updates every 5 seconds
-                if (current_time - last_log_update) > 5:
-                    elapsed = current_time - last_log_update
-                    emails_per_sec = log_counter / elapsed if elapsed > 0 else 0
+                            # Update status with processing speed, sent with the progress as one tick
+                            emails_per_second = processed / (current_time - start_time)
+                            remaining_time = (total_emails - processed) / emails_per_second
 
-                    # Log to terminal
-                    logger.info(
-                        f"Processed: {log_counter:,} emails since last update "
-                        f"({emails_per_sec:.1f} emails/sec), "
-                        f"Progress: {i + 1:,}/{total_emails:,} ({min(100, int((i + 1) / total_emails * 100))}%)"
-                    )
-
-                    # Reset counter
-                    log_counter = 0
-                    last_log_update = current_time
-
-                # Update GUI progress
-                if i % 100 == 0 or (current_time - last_update_time) > 0.5:
-                    progress_value = min(int((i + 1) / total_emails * 100), 100)
-                    self.queue.put(('progress', progress_value))
-
-                    # Update status with processing speed
-                    if (current_time - start_time) > 0:
-                        emails_per_second = (i + 1) / (current_time - start_time)
-                        estimated_total_time = total_emails / emails_per_second if emails_per_second > 0 else 0
-                        remaining_time = estimated_total_time - (current_time - start_time)
-
-                        status_text = (
-                            f"Processed {i + 1:,} of {total_emails:,} emails "
-                            f"({emails_per_second:.1f} emails/sec, "
-                            f"~{remaining_time / 60:.1f} min remaining)"
-                        )
-                        self.queue.put(('status', status_text))
+                            status_text = status_template.format(processed, emails_per_second, remaining_time / 60)
+                            self.queue.put(('tick', (progress_value, status_text)))
 
-                    last_update_time = current_time
+                            last_update_time = current_time
 
-            # Flush changes to disk
-            temp_mbox.flush()
-            temp_mbox.close()
+                # Flush changes to disk
+                temp_mbox.flush()
+                if in_place:
+                    # The kept emails now fill the start of the file, cut off the rest. The map
+                    # is closed first, Windows can't shorten a mapped file
+                    emails.source.close()
+                # Either way nothing past the written emails is kept
+                temp_mbox.truncate()
+                os.fsync(temp_mbox.fileno())
+            rewriting_original = False
 
-            # Close the original mbox file
-            self.mbox.close()
+            if not in_place:
+                # Close the original mbox file
+                emails.source.close()
+                emails_valid = False
 
-            # Replace the original file with the temp file
-            self.queue.put(('status', "Replacing original file..."))
+                # Replace the original file with the temp file
+                self.queue.put(('status', "Replacing original file..."))
+
+                try:
+                    # Atomic on every platform, so the original is never missing
+                    os.replace(temp_file_path, file_path)
+                except Exception as e:
+                    error_msg = f"Error replacing original file: {str(e)}"
+                    logger.error(error_msg)
+                    logger.error(traceback.format_exc())
+                    self.queue.put(('error', error_msg))
+                    self.queue.put(('status', f"Error: Original file unchanged, temp file at {temp_file_path}"))
+                    return
 
             try:
-                # On Windows, we need to remove the original file first
-                if os.name == 'nt' and os.path.exists(file_path):
-                    os.remove(file_path)
+                # Reopen the modified file
+                self.mbox = FastMbox(file_path)
 
-                os.rename(temp_file_path, file_path)
+                # Messages moved when the file was rewritten, their new positions are already known
+                file_size = os.path.getsize(file_path)
+                if file_size != new_size:
+                    raise ValueError(f"Expected the modified file to be {new_size:,} bytes, found {file_size:,}")
+                kept = emails.take(rows)
+                kept.source = self.mbox
+                kept.cols['offset'] = new_offsets
+                kept.cols['length'] = new_lengths
 
-                # Reopen the modified file
-                self.mbox = mailbox.mbox(file_path)
+                if in_place:
+                    # Bodies extracted while the file was being rewritten may be of the wrong bytes
+                    kept.cols['body'] = kept.new_column('body', repeat(None, len(kept)))
 
-                modification_time = time.time() - start_time
-                result_msg = f"Modified original mbox file to keep {total_emails:,} emails in {modification_time:.1f}s"
+                # Update the stored emails to match what's now in the file
+                self.emails = kept
+                emails_valid = True
+                self.render_email_body.cache_clear()
+                self.filtered_emails = array('I', range(len(self.emails)))
+                self._filter_cache.clear()
+
+                modification_time = time.monotonic() - start_time
+                result_msg = f"Modified original mbox file to keep {total_text} emails in {modification_time:.1f}s"
                 logger.info(result_msg)
                 logger.info(f"Modification completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 logger.info(f"Average processing speed: {total_emails / modification_time:.1f} emails/sec")
-                self.queue.put(('status', result_msg))
-                self.queue.put(('success', f"Successfully modified original file to keep {total_emails:,} emails"))
-
-                # Update the stored emails to match what's now in the file
-                self.emails = self.filtered_emails.copy()
+                self.queue.put(('tick', (100, result_msg)))
+                self.queue.put(('success', f"Successfully modified original file to keep {total_text} emails"))
                 self.update_stats()
 
             except Exception as e:
-                error_msg = f"Error replacing original file: {str(e)}"
+                error_msg = f"Error reopening modified file: {str(e)}"
                 logger.error(error_msg)
                 logger.error(traceback.format_exc())
                 self.queue.put(('error', error_msg))
-                self.queue.put(('status', f"Error: Original file unchanged, temp file at {temp_file_path}"))
+                self.queue.put(('status', "Modified file could not be reopened, please load it again"))
 
         except Exception as e:
-            error_msg = f"Error modifying original file: {str(e)}"
+            if rewriting_original:
+                error_msg = (f"Error rewriting original file: {str(e)}\n\n"
+                             f"The original file was partially rewritten and is now incomplete. "
+                             f"Restore it from the backup at {backup_path}")
+                status_text = "Original file partially rewritten, restore it from the backup"
+            else:
+                error_msg = f"Error modifying original file: {str(e)}"
+                status_text = "Modification failed, original file unchanged"
             logger.error(error_msg)
             logger.error(traceback.format_exc())
             self.queue.put(('error', error_msg))
-            self.queue.put(('status', "Modification failed"))
+            self.queue.put(('status', status_text))
+
+        finally:
+            self.queue.put(('rewrite_finished', emails_valid))
+
+
+def extract_emails(path, spans):
+    """Process pool worker, returns the email data of the (offset, length) messages of an mbox file"""
+    mbox = FastMbox(path)
+    emails = []
+    try:
+        for offset, length in spans:
+            try:
+                emails.append(MboxManagerApp.extract_email_data(mbox.get_bytes(offset, length), offset))
+            except Exception as e:
+                logger.error(f"Error processing email at offset {offset:,}: {str(e)}")
+    finally:
+        mbox.close()
+    return emails
+
+
+def extract_bodies(path, spans):
+    """Process pool worker, returns the lowercased bodies of the (offset, length) messages of an mbox file"""
+    mbox = FastMbox(path)
+    bodies = []
+    try:
+        for offset, length in spans:
+            try:
+                bodies.append(body_search_text(mbox.get_bytes(offset, length)))
+            except Exception:
+                bodies.append("")
+    finally:
+        mbox.close()
+    return bodies
 
 
 def main():